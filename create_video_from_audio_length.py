@@ -2,7 +2,9 @@ import os
 import random
 import subprocess
 import shlex
+import shutil
 import sys
+import tempfile
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QPushButton, QLabel, QLineEdit, QTextEdit, QFileDialog, QProgressBar, QMessageBox
@@ -18,6 +20,7 @@ class VideoCreationThread(QThread):
     progress_signal = pyqtSignal(str)            # For general log messages
     file_progress_signal = pyqtSignal(int, int)  # current_file_index, total_files
     finished_signal = pyqtSignal(bool, str)      # success (bool), final_message (str)
+    stage_signal = pyqtSignal(str)               # stage name, emitted when a stage begins
 
     def __init__(self, audio_dir, video_material_dir, output_dir, parent=None):
         super().__init__(parent)
@@ -25,6 +28,7 @@ class VideoCreationThread(QThread):
         self.video_material_dir = video_material_dir
         self.output_dir = output_dir
         self.is_running = True
+        self.current_process = None # ffprobe/ffmpeg process currently running, terminated by stop()
 
     def _get_media_duration(self, file_path):
         command = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", file_path]
@@ -32,6 +36,8 @@ class VideoCreationThread(QThread):
         try:
             creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, creationflags=creationflags)
+            self.current_process = process
+            if not self.is_running: process.terminate() # stop() may have run before the process was registered
             output, error = process.communicate(timeout=30)
             if process.returncode == 0 and output:
                 return float(output.strip())
@@ -45,12 +51,16 @@ class VideoCreationThread(QThread):
         except Exception as e:
             self.progress_signal.emit(f"执行 ffprobe 时发生未知错误 for {os.path.basename(file_path)}: {e}")
             return None
+        finally:
+            self.current_process = None
 
     def _run_ffmpeg_command(self, command_list, operation_description):
         self.progress_signal.emit(f"执行 FFmpeg: {operation_description}...")
         try:
             creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             process = subprocess.Popen(command_list, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, creationflags=creationflags)
+            self.current_process = process
+            if not self.is_running: process.terminate() # stop() may have run before the process was registered
             stdout, stderr = process.communicate() # Wait for command to complete
 
             if not self.is_running: # Check if thread was stopped
@@ -71,15 +81,25 @@ class VideoCreationThread(QThread):
         except Exception as e:
             self.progress_signal.emit(f"执行 FFmpeg/ffprobe 命令时发生 Python 错误: {e}")
             return False
+        finally:
+            self.current_process = None
 
     def run(self):
-        self.is_running = True
         self.progress_signal.emit(f"开始处理...")
         self.progress_signal.emit(f"音频文件夹: {self.audio_dir}")
         self.progress_signal.emit(f"视频素材文件夹: {self.video_material_dir}")
         self.progress_signal.emit(f"输出文件夹: {self.output_dir}")
 
+        # Each run gets its own temp dir so several jobs can render concurrently
+        temp_dir = tempfile.mkdtemp(prefix="rpa_clip_")
+        try:
+            self._process(temp_dir)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _process(self, temp_dir):
         # 1. 扫描视频素材并获取时长
+        self.stage_signal.emit("scan_video_material")
         self.progress_signal.emit("扫描视频素材...")
         video_files_with_durations = []
         try:
@@ -109,6 +129,7 @@ class VideoCreationThread(QThread):
         self.progress_signal.emit(f"总可用视频素材时长: {total_video_material_duration:.2f} 秒。")
 
         # 2. 扫描音频文件
+        self.stage_signal.emit("scan_audio")
         audio_files_to_process = []
         try:
             for item in os.listdir(self.audio_dir):
@@ -136,6 +157,7 @@ class VideoCreationThread(QThread):
             self.file_progress_signal.emit(idx, len(audio_files_to_process))
             self.progress_signal.emit(f"\n--- 开始处理音频文件: {os.path.basename(audio_file_path)} ({idx+1}/{len(audio_files_to_process)}) ---")
 
+            self.stage_signal.emit("probe_audio")
             target_audio_duration = self._get_media_duration(audio_file_path)
             if target_audio_duration is None:
                 self.progress_signal.emit(f"无法获取音频 {os.path.basename(audio_file_path)} 的时长。跳过此文件。")
@@ -169,7 +191,7 @@ class VideoCreationThread(QThread):
             self.progress_signal.emit(f"为 {os.path.basename(audio_file_path)} 选择了 {len(selected_videos_for_concat)} 个片段，预计总时长 {current_concatenated_duration:.2f}s.")
 
             # 使用绝对路径写入文件列表，以提高 ffmpeg -safe 0 的可靠性
-            abs_temp_file_list = os.path.abspath(TEMP_FILE_LIST)
+            abs_temp_file_list = os.path.join(temp_dir, TEMP_FILE_LIST)
             with open(abs_temp_file_list, 'w', encoding='utf-8') as f:
                 for video_path_item in selected_videos_for_concat:
                     # 1. 获取绝对路径
@@ -180,7 +202,8 @@ class VideoCreationThread(QThread):
                     line_to_write = f"file '{normalized_path}'\n"
                     f.write(line_to_write)
             
-            abs_temp_concat_video = os.path.abspath(TEMP_CONCATENATED_VIDEO)
+            abs_temp_concat_video = os.path.join(temp_dir, TEMP_CONCATENATED_VIDEO)
+            self.stage_signal.emit("concat")
             concat_command = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', abs_temp_file_list, '-c', 'copy', abs_temp_concat_video]
             if not self._run_ffmpeg_command(concat_command, f"拼接视频 for {os.path.basename(audio_file_path)}"): 
                 if os.path.exists(abs_temp_file_list): os.remove(abs_temp_file_list)
@@ -191,6 +214,7 @@ class VideoCreationThread(QThread):
             output_video_filename = os.path.splitext(os.path.basename(audio_file_path))[0] + ".mp4"
             output_video_path = os.path.join(self.output_dir, output_video_filename)
             
+            self.stage_signal.emit("merge")
             merge_command = ['ffmpeg', '-y', '-i', abs_temp_concat_video, '-i', audio_file_path, 
                              '-c:v', 'copy', '-c:a', 'aac', '-map', '0:v:0', '-map', '1:a:0', 
                              '-shortest', output_video_path]
@@ -216,6 +240,9 @@ class VideoCreationThread(QThread):
     def stop(self):
         self.is_running = False
         self.progress_signal.emit("正在尝试中止处理...")
+        process = self.current_process
+        if process is not None and process.poll() is None:
+            process.terminate() # Unblocks communicate() instead of waiting for ffmpeg to finish
 
 class VideoCreatorWindow(QMainWindow):
     def __init__(self):
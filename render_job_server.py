@@ -0,0 +1,469 @@
+import argparse
+import heapq
+import hmac
+import ipaddress
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PyQt6.QtCore import Qt
+
+from create_video_from_audio_length import VideoCreationThread
+from video_audio_extractor import FFmpegThread
+
+# --- 配置 ---
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+LOG_TAIL_LINES = 200
+FINISHED_JOB_TTL = 3600           # seconds a finished job stays queryable
+MAX_FINISHED_JOBS = 500           # finished jobs kept at most, oldest dropped first
+TOKEN_ENV_VAR = "RENDER_JOB_TOKEN"
+TOKEN_HEADER = "X-Render-Token"
+# --- End Configuration ---
+
+# Job type -> (thread class, folder field names in constructor order, folders that must already exist)
+JOB_TYPES = {
+    "create": (VideoCreationThread, ("audio_dir", "video_material_dir", "output_dir"), ("audio_dir", "video_material_dir")),
+    "extract": (FFmpegThread, ("video_folder", "audio_folder", "silent_video_folder"), ("video_folder",)),
+}
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class RenderJob:
+    def __init__(self, job_type, folders, priority):
+        self.id = uuid.uuid4().hex[:12]
+        self.job_type = job_type
+        self.folders = folders
+        self.priority = priority
+        self.state = QUEUED
+        self.message = ""
+        self.progress = (0, 0)             # done, total
+        self.stage = None
+        self.stage_timings = {}            # stage name -> accumulated seconds
+        self.log = deque(maxlen=LOG_TAIL_LINES)
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.thread = None
+        self.cancel_requested = False
+        self._stage_started = None
+        self._lock = threading.Lock()
+
+    # --- Slots (called directly from the worker thread) ---
+    def on_log(self, message):
+        with self._lock:
+            self.log.append(message)
+
+    def on_progress(self, done, total):
+        with self._lock:
+            self.progress = (done, total)
+
+    def on_stage(self, stage):
+        with self._lock:
+            if self.state in FINAL_STATES:
+                return
+            self._close_stage()
+            self.stage = stage
+            self._stage_started = time.monotonic()
+
+    def on_finished(self, success, message):
+        with self._lock:
+            self.message = message
+            if self.cancel_requested:
+                self._finish(CANCELLED)
+            else:
+                self._finish(SUCCEEDED if success else FAILED)
+
+    def _finish(self, state):
+        # Caller holds self._lock; a job in a final state always has finished_at and complete stage timings
+        self.state = state
+        self._close_stage()
+        self.stage = None
+        if self.finished_at is None:
+            self.finished_at = time.time()
+
+    def _close_stage(self):
+        if self.stage is not None and self._stage_started is not None:
+            elapsed = time.monotonic() - self._stage_started
+            self.stage_timings[self.stage] = self.stage_timings.get(self.stage, 0.0) + elapsed
+        self._stage_started = None
+
+    def mark_started(self):
+        with self._lock:
+            self.state = RUNNING
+            self.started_at = time.time()
+
+    def attach_thread(self, thread):
+        """Registers the pipeline thread; returns False if the job was cancelled in the meantime."""
+        with self._lock:
+            self.thread = thread
+            return not self.cancel_requested
+
+    def request_cancel(self, queued_message):
+        """Marks the job cancelled and returns the pipeline thread that still has to be stopped, if any."""
+        with self._lock:
+            if self.state in FINAL_STATES:
+                raise JobError(409, f"任务已结束 ({self.state})，无法取消。")
+            self.cancel_requested = True
+            if self.state == QUEUED:
+                # Leave the heap entry in place; the worker skips it when popped
+                self.message = queued_message
+                self._finish(CANCELLED)
+                return None
+            return self.thread
+
+    def mark_done(self):
+        with self._lock:
+            if self.state not in FINAL_STATES:
+                # FFmpegThread does not emit finished_signal when it is stopped
+                if not self.message:
+                    self.message = "处理被用户中止。" if self.cancel_requested else "处理意外结束。"
+                self._finish(CANCELLED if self.cancel_requested else FAILED)
+            # Drop the QThread so finished jobs only keep their status
+            self.thread = None
+
+    def final_since(self):
+        """Returns finished_at once the job is in a final state, otherwise None."""
+        with self._lock:
+            return self.finished_at if self.state in FINAL_STATES else None
+
+    def to_dict(self, include_log=False):
+        with self._lock:
+            done, total = self.progress
+            data = {
+                "id": self.id,
+                "type": self.job_type,
+                "folders": self.folders,
+                "priority": self.priority,
+                "state": self.state,
+                "message": self.message,
+                "progress": {"done": done, "total": total,
+                             "fraction": round(done / total, 4) if total else None},
+                "stage": self.stage,
+                "stage_timings": {k: round(v, 3) for k, v in self.stage_timings.items()},
+                "submitted_at": self.submitted_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+            if self.stage is not None and self._stage_started is not None:
+                data["stage_elapsed"] = round(time.monotonic() - self._stage_started, 3)
+            if include_log:
+                data["log"] = list(self.log)
+            return data
+
+
+class JobQueue:
+    """Priority queue of render jobs drained by a fixed pool of worker threads.
+
+    Lower priority values run first; jobs with equal priority run in submission order.
+    """
+
+    def __init__(self, worker_count=DEFAULT_WORKERS):
+        self.worker_count = max(1, worker_count)
+        self.jobs = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._shutting_down = False
+        self._workers = [threading.Thread(target=self._worker_loop, name=f"render-worker-{i}", daemon=True)
+                         for i in range(self.worker_count)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, job_type, folders, priority=0):
+        if job_type not in JOB_TYPES:
+            raise JobError(400, f"未知的任务类型: {job_type!r}，可选: {', '.join(JOB_TYPES)}")
+        _, field_names, required_existing = JOB_TYPES[job_type]
+        if not isinstance(folders, dict):
+            raise JobError(400, "folders 必须是对象。")
+        missing = [name for name in field_names if not folders.get(name)]
+        if missing:
+            raise JobError(400, f"缺少路径: {', '.join(missing)}")
+        not_str = [name for name in field_names if not isinstance(folders[name], str)]
+        if not_str:
+            raise JobError(400, f"路径必须是字符串: {', '.join(not_str)}")
+        for name in required_existing:
+            if not os.path.isdir(folders[name]):
+                raise JobError(400, f"路径无效: {name} = {folders[name]}")
+        if isinstance(priority, bool) or not isinstance(priority, (int, str)):
+            raise JobError(400, f"priority 必须是整数: {priority!r}")
+        try:
+            priority = int(priority)
+        except ValueError:
+            raise JobError(400, f"priority 必须是整数: {priority!r}")
+
+        job = RenderJob(job_type, {name: folders[name] for name in field_names}, priority)
+        with self._cond:
+            if self._shutting_down:
+                raise JobError(503, "服务正在关闭。")
+            self._prune_finished()
+            self.jobs[job.id] = job
+            heapq.heappush(self._heap, (priority, next(self._counter), job))
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            self._prune_finished()
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise JobError(404, f"任务不存在: {job_id}")
+        return job
+
+    def all_jobs(self):
+        with self._cond:
+            self._prune_finished()
+            return sorted(self.jobs.values(), key=lambda j: j.submitted_at)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        with self._cond:
+            thread = job.request_cancel("任务在排队时被取消。")
+        # stop() emits progress_signal into job.on_log, so call it without holding any lock
+        if thread is not None:
+            thread.stop()
+        return job
+
+    def shutdown(self):
+        threads = []
+        with self._cond:
+            self._shutting_down = True
+            for job in self.jobs.values():
+                try:
+                    threads.append(job.request_cancel("服务关闭，任务被取消。"))
+                except JobError:
+                    pass # already finished
+            self._cond.notify_all()
+        for thread in threads:
+            if thread is not None:
+                thread.stop()
+        for worker in self._workers:
+            worker.join()
+
+    def _prune_finished(self):
+        # Caller holds self._cond
+        now = time.time()
+        finished = []
+        for job_id, job in list(self.jobs.items()):
+            finished_at = job.final_since()
+            if finished_at is None:
+                continue
+            if now - finished_at > FINISHED_JOB_TTL:
+                del self.jobs[job_id]
+            else:
+                finished.append((finished_at, job_id))
+        if len(finished) > MAX_FINISHED_JOBS:
+            finished.sort()
+            for _, job_id in finished[:len(finished) - MAX_FINISHED_JOBS]:
+                del self.jobs[job_id]
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2].state != QUEUED:
+                    heapq.heappop(self._heap)
+                if self._shutting_down:
+                    return None
+                if self._heap:
+                    job = heapq.heappop(self._heap)[2]
+                    job.mark_started()
+                    return job
+                self._cond.wait()
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._run_job(job)
+            except Exception:
+                # Never let one job take a worker down with it
+                traceback.print_exc()
+                job.mark_done()
+
+    def _run_job(self, job):
+        try:
+            if job.job_type == "create":
+                output_dir = job.folders["output_dir"]
+                if not os.path.isdir(output_dir):
+                    try:
+                        os.makedirs(output_dir)
+                        job.on_log(f"已创建输出文件夹: {output_dir}")
+                    except OSError as e:
+                        job.on_finished(False, f"无法创建输出文件夹 {output_dir}: {e}")
+                        return
+            thread_cls, field_names, _ = JOB_TYPES[job.job_type]
+            thread = thread_cls(*(job.folders[name] for name in field_names))
+            # run() is called directly on this worker, so the slots must be invoked in the emitting thread
+            direct = Qt.ConnectionType.DirectConnection
+            thread.progress_signal.connect(job.on_log, direct)
+            thread.finished_signal.connect(job.on_finished, direct)
+            thread.file_progress_signal.connect(job.on_progress, direct)
+            thread.stage_signal.connect(job.on_stage, direct)
+            if job.attach_thread(thread):
+                thread.run()
+        except Exception as e:
+            job.on_finished(False, f"任务执行时发生 Python 错误: {e}")
+        finally:
+            job.mark_done()
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API:
+
+    POST /jobs               {"type": "create"|"extract", "folders": {...}, "priority": 0}
+    GET  /jobs               list all jobs
+    GET  /jobs/<id>          job status, progress, stage timings and recent log lines
+    POST /jobs/<id>/cancel   cancel a queued or running job (DELETE /jobs/<id> does the same)
+    GET  /status             queue summary
+
+    POST requests must be sent as application/json, which a web page cannot do cross-origin
+    without a CORS preflight. If the server has a token, every request must carry it in the
+    X-Render-Token header.
+    """
+
+    server_version = "RenderJobServer/1.0"
+
+    @property
+    def queue(self):
+        return self.server.job_queue
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise JobError(400, f"无效的 Content-Length: {self.headers.get('Content-Length')!r}")
+        if length < 0:
+            raise JobError(400, f"无效的 Content-Length: {length}")
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise JobError(400, f"请求体不是有效的 JSON: {e}")
+
+    def _path_parts(self):
+        return [part for part in self.path.split("?", 1)[0].split("/") if part]
+
+    def _check_request(self):
+        token = self.server.token
+        if token and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, "").encode("utf-8"), token.encode("utf-8")):
+            raise JobError(401, f"缺少或错误的 {TOKEN_HEADER}。")
+        if self.command == "POST":
+            content_type = (self.headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+            if content_type != "application/json":
+                raise JobError(415, "POST 请求的 Content-Type 必须是 application/json。")
+
+    def _dispatch(self, handler):
+        try:
+            self._check_request()
+            status, payload = handler(self._path_parts())
+        except JobError as e:
+            status, payload = e.status, {"error": e.message}
+        except Exception as e:
+            traceback.print_exc()
+            status, payload = 500, {"error": f"服务器内部错误: {e}"}
+        self._send_json(status, payload)
+
+    def do_GET(self):
+        self._dispatch(self._handle_get)
+
+    def do_POST(self):
+        self._dispatch(self._handle_post)
+
+    def do_DELETE(self):
+        self._dispatch(self._handle_delete)
+
+    def _handle_get(self, parts):
+        if parts == ["jobs"]:
+            return 200, {"jobs": [job.to_dict() for job in self.queue.all_jobs()]}
+        if len(parts) == 2 and parts[0] == "jobs":
+            return 200, self.queue.get(parts[1]).to_dict(include_log=True)
+        if parts == ["status"]:
+            states = {}
+            for job in self.queue.all_jobs():
+                states[job.state] = states.get(job.state, 0) + 1
+            return 200, {"workers": self.queue.worker_count, "jobs": states}
+        raise JobError(404, f"未知路径: {self.path}")
+
+    def _handle_post(self, parts):
+        if parts == ["jobs"]:
+            data = self._read_json()
+            if not isinstance(data, dict):
+                raise JobError(400, "请求体必须是 JSON 对象。")
+            job = self.queue.submit(data.get("type"), data.get("folders"), data.get("priority", 0))
+            return 201, job.to_dict()
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            return 200, self.queue.cancel(parts[1]).to_dict()
+        raise JobError(404, f"未知路径: {self.path}")
+
+    def _handle_delete(self, parts):
+        if len(parts) == 2 and parts[0] == "jobs":
+            return 200, self.queue.cancel(parts[1]).to_dict()
+        raise JobError(404, f"未知路径: {self.path}")
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[{self.log_date_time_string()}] {format % args}\n")
+
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地渲染任务服务：通过 HTTP 提交视频生成/音频提取任务。")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址 (默认 {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口 (默认 {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"并发任务数 (默认 {DEFAULT_WORKERS})")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV_VAR),
+                        help=f"要求请求头 {TOKEN_HEADER} 携带此令牌 (默认读取环境变量 {TOKEN_ENV_VAR})")
+    args = parser.parse_args()
+    if not args.token and not _is_loopback(args.host):
+        parser.error(f"监听非本机地址 {args.host} 时必须设置 --token 或环境变量 {TOKEN_ENV_VAR}。")
+
+    server = ThreadingHTTPServer((args.host, args.port), JobRequestHandler)
+    server.token = args.token
+    server.job_queue = JobQueue(args.workers)
+    print(f"渲染任务服务已启动: http://{args.host}:{args.port} (workers={args.workers})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("正在关闭服务，中止运行中的任务...")
+    finally:
+        server.server_close()
+        server.job_queue.shutdown()
+
+
+if __name__ == "__main__":
+    main()
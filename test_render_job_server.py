@@ -0,0 +1,283 @@
+import http.client
+import json
+import sys
+import threading
+import time
+from unittest import mock
+
+import pytest
+from PyQt6.QtCore import QThread, pyqtSignal
+
+import render_job_server
+from render_job_server import CANCELLED, FAILED, FINAL_STATES, QUEUED, RUNNING, SUCCEEDED, JobError, JobQueue
+from video_audio_extractor import FFmpegThread
+
+run_order = []
+
+
+class FakePipelineThread(QThread):
+    """Stands in for the ffmpeg pipelines: records its run order and finishes immediately."""
+    progress_signal = pyqtSignal(str)
+    file_progress_signal = pyqtSignal(int, int)
+    finished_signal = pyqtSignal(bool, str)
+    stage_signal = pyqtSignal(str)
+
+    def __init__(self, name, unused_a, unused_b, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.is_running = True
+
+    def run(self):
+        run_order.append(self.name)
+        self.stage_signal.emit("work")
+        self.file_progress_signal.emit(1, 1)
+        self.finished_signal.emit(True, "done")
+
+    def stop(self):
+        self.is_running = False
+
+
+class BlockingPipelineThread(FakePipelineThread):
+    """Runs until stop() is called or the release event is set."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def run(self):
+        run_order.append(self.name)
+        self.started.set()
+        while self.is_running and not self.release.is_set():
+            time.sleep(0.01)
+        if self.is_running:
+            self.finished_signal.emit(True, "released")
+
+
+class LingeringPipelineThread(BlockingPipelineThread):
+    """Emits finished_signal and then keeps running, like the creator's temp-dir cleanup."""
+
+    def run(self):
+        run_order.append(self.name)
+        self.stage_signal.emit("render")
+        self.finished_signal.emit(True, "done")
+        self.started.set()
+        self.release.wait(5)
+
+
+class CrashingPipelineThread(FakePipelineThread):
+    def run(self):
+        raise RuntimeError("boom")
+
+
+FOLDERS = ("name", "a", "b")
+
+
+@pytest.fixture
+def queue_factory(tmp_path):
+    run_order.clear()
+    BlockingPipelineThread.release = threading.Event()
+    BlockingPipelineThread.started = threading.Event()
+    job_types = {
+        "fake": (FakePipelineThread, FOLDERS, ()),
+        "block": (BlockingPipelineThread, FOLDERS, ()),
+        "crash": (CrashingPipelineThread, FOLDERS, ()),
+        "linger": (LingeringPipelineThread, FOLDERS, ()),
+    }
+    queues = []
+
+    def make(workers=1):
+        queue = JobQueue(workers)
+        queues.append(queue)
+        return queue
+
+    with mock.patch.dict(render_job_server.JOB_TYPES, job_types):
+        yield make
+        BlockingPipelineThread.release.set()
+        for queue in queues:
+            queue.shutdown()
+
+
+def folders(name):
+    return {"name": name, "a": "x", "b": "y"}
+
+
+def wait_final(*jobs, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(job.state in FINAL_STATES for job in jobs):
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"jobs did not finish: {[job.state for job in jobs]}")
+
+
+def test_priority_then_fifo_order(queue_factory):
+    queue = queue_factory(workers=1)
+    blocker = queue.submit("block", folders("blocker"))
+    assert BlockingPipelineThread.started.wait(5)
+    jobs = [queue.submit("fake", folders(name), priority)
+            for name, priority in [("low", 5), ("first", 1), ("second", 1), ("urgent", 0)]]
+    BlockingPipelineThread.release.set()
+    wait_final(blocker, *jobs)
+    assert run_order == ["blocker", "urgent", "first", "second", "low"]
+    assert all(job.state == SUCCEEDED for job in jobs)
+    assert jobs[0].to_dict()["progress"] == {"done": 1, "total": 1, "fraction": 1.0}
+    assert "work" in jobs[0].to_dict()["stage_timings"]
+
+
+def test_cancel_queued_job_never_runs(queue_factory):
+    queue = queue_factory(workers=1)
+    blocker = queue.submit("block", folders("blocker"))
+    assert BlockingPipelineThread.started.wait(5)
+    queued = queue.submit("fake", folders("queued"))
+    assert queue.cancel(queued.id).state == CANCELLED
+    with pytest.raises(JobError) as excinfo:
+        queue.cancel(queued.id)
+    assert excinfo.value.status == 409
+    BlockingPipelineThread.release.set()
+    wait_final(blocker)
+    assert run_order == ["blocker"]
+
+
+def test_cancel_running_job(queue_factory):
+    queue = queue_factory(workers=1)
+    job = queue.submit("block", folders("running"))
+    assert BlockingPipelineThread.started.wait(5)
+    assert job.state == RUNNING
+    queue.cancel(job.id)
+    wait_final(job)
+    assert job.state == CANCELLED
+    assert job.thread is None
+
+
+@pytest.mark.parametrize("job_type, job_folders, priority", [
+    ("nope", folders("x"), 0),
+    ("fake", None, 0),
+    ("fake", {"name": "x", "a": "x"}, 0),
+    ("fake", {"name": 5, "a": "x", "b": "y"}, 0),
+    ("fake", {"name": ["x"], "a": "x", "b": "y"}, 0),
+    ("fake", folders("x"), "high"),
+    ("fake", folders("x"), None),
+])
+def test_submit_rejects_bad_input(queue_factory, job_type, job_folders, priority):
+    queue = queue_factory()
+    with pytest.raises(JobError) as excinfo:
+        queue.submit(job_type, job_folders, priority)
+    assert excinfo.value.status == 400
+    assert queue.all_jobs() == []
+
+
+def test_crashing_job_does_not_kill_worker(queue_factory):
+    queue = queue_factory(workers=1)
+    crashed = queue.submit("crash", folders("crash"))
+    after = queue.submit("fake", folders("after"))
+    wait_final(crashed, after)
+    assert crashed.state == FAILED
+    assert "boom" in crashed.message
+    assert after.state == SUCCEEDED
+
+
+def test_uncreatable_output_dir_fails_job(tmp_path):
+    audio = tmp_path / "audio"
+    audio.mkdir()
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    queue = JobQueue(1)
+    try:
+        job = queue.submit("create", {"audio_dir": str(audio), "video_material_dir": str(audio),
+                                      "output_dir": str(blocker / "out")})
+        wait_final(job)
+        assert job.state == FAILED
+        assert "无法创建输出文件夹" in job.message
+    finally:
+        queue.shutdown()
+
+
+def test_finished_jobs_are_pruned(queue_factory):
+    queue = queue_factory(workers=1)
+    with mock.patch.object(render_job_server, "MAX_FINISHED_JOBS", 2):
+        jobs = [queue.submit("fake", folders(str(i))) for i in range(4)]
+        wait_final(*jobs)
+        assert [job.id for job in queue.all_jobs()] == [job.id for job in jobs[2:]]
+    with mock.patch.object(render_job_server, "FINISHED_JOB_TTL", -1):
+        assert queue.all_jobs() == []
+
+
+def test_job_final_before_thread_returns(queue_factory):
+    queue = queue_factory(workers=1)
+    job = queue.submit("linger", folders("linger"))
+    assert BlockingPipelineThread.started.wait(5)
+    data = job.to_dict()
+    assert data["state"] == SUCCEEDED
+    assert data["finished_at"] is not None
+    assert data["stage"] is None and "stage_elapsed" not in data
+    assert "render" in data["stage_timings"]
+    # Pruning must cope with a job that is final while its worker is still busy
+    with mock.patch.object(render_job_server, "MAX_FINISHED_JOBS", 0):
+        queued = queue.submit("fake", folders("next"))
+        assert queue.all_jobs() == [queued]
+    BlockingPipelineThread.release.set()
+
+
+def test_stop_terminates_running_process():
+    thread = FFmpegThread("v", "a", "s")
+    threading.Timer(0.2, thread.stop).start()
+    started = time.monotonic()
+    command = [sys.executable, "-c", "import time; time.sleep(30)"]
+    assert thread.run_ffmpeg_command(command, "sleep") is False
+    assert time.monotonic() - started < 5
+
+
+@pytest.fixture
+def server(queue_factory):
+    httpd = render_job_server.ThreadingHTTPServer(("127.0.0.1", 0), render_job_server.JobRequestHandler)
+    httpd.token = "secret"
+    httpd.job_queue = queue_factory()
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def request(httpd, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection(*httpd.server_address, timeout=5)
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    payload = json.loads(response.read())
+    conn.close()
+    return response.status, payload
+
+
+JSON_HEADERS = {"Content-Type": "application/json", "X-Render-Token": "secret"}
+
+
+def test_http_submit_and_status(server):
+    body = json.dumps({"type": "fake", "folders": folders("http")})
+    status, payload = request(server, "POST", "/jobs", body, JSON_HEADERS)
+    assert status == 201
+    assert payload["state"] in (QUEUED, RUNNING, SUCCEEDED)
+    status, payload = request(server, "GET", f"/jobs/{payload['id']}", headers=JSON_HEADERS)
+    assert status == 200
+    assert "log" in payload
+
+
+def test_http_requires_token(server):
+    body = json.dumps({"type": "fake", "folders": folders("http")})
+    status, _ = request(server, "POST", "/jobs", body, {"Content-Type": "application/json"})
+    assert status == 401
+    status, _ = request(server, "GET", "/jobs", headers={"X-Render-Token": "wrong"})
+    assert status == 401
+
+
+def test_http_rejects_non_json_post(server):
+    body = json.dumps({"type": "fake", "folders": folders("http")})
+    status, _ = request(server, "POST", "/jobs", body, {"Content-Type": "text/plain", "X-Render-Token": "secret"})
+    assert status == 415
+    assert server.job_queue.all_jobs() == []
+
+
+def test_http_bad_input_gets_a_response(server):
+    status, payload = request(server, "POST", "/jobs", "{}", dict(JSON_HEADERS, **{"Content-Length": "abc"}))
+    assert status == 400
+    body = json.dumps({"type": "extract", "folders": {"video_folder": ["v"], "audio_folder": "a",
+                                                      "silent_video_folder": "s"}})
+    status, payload = request(server, "POST", "/jobs", body, JSON_HEADERS)
+    assert status == 400
+    assert "error" in payload
@@ -11,6 +11,8 @@ class FFmpegThread(QThread):
     progress_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(bool, str) # success, message
     file_processed_signal = pyqtSignal(str) # filename
+    file_progress_signal = pyqtSignal(int, int) # processed_files, total_files
+    stage_signal = pyqtSignal(str) # stage name, emitted when a stage begins
 
     def __init__(self, video_folder, audio_folder, silent_video_folder, parent=None):
         super().__init__(parent)
@@ -18,6 +20,7 @@ class FFmpegThread(QThread):
         self.audio_folder = audio_folder
         self.silent_video_folder = silent_video_folder
         self.is_running = True
+        self.current_process = None # ffmpeg process currently running, terminated by stop()
 
     def run_ffmpeg_command(self, command_list, operation_description):
         self.progress_signal.emit(f"执行 FFmpeg: {operation_description}...")
@@ -25,6 +28,8 @@ class FFmpegThread(QThread):
             # CREATE_NO_WINDOW is for Windows to hide the console
             creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             process = subprocess.Popen(command_list, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, creationflags=creationflags)
+            self.current_process = process
+            if not self.is_running: process.terminate() # stop() may have run before the process was registered
             stdout, stderr = process.communicate() # Wait for command to complete
 
             if not self.is_running: # Check if thread was stopped prematurely
@@ -49,9 +54,10 @@ class FFmpegThread(QThread):
         except Exception as e:
             self.progress_signal.emit(f"执行 FFmpeg 命令时发生 Python 错误: {e}")
             return False
+        finally:
+            self.current_process = None
 
     def run(self):
-        self.is_running = True
         self.progress_signal.emit(f"视频文件夹: {self.video_folder}")
         self.progress_signal.emit(f"音频输出文件夹: {self.audio_folder}")
         self.progress_signal.emit(f"无声视频输出文件夹: {self.silent_video_folder}")
@@ -79,6 +85,7 @@ class FFmpegThread(QThread):
         if total_files_to_process == 0:
             self.finished_signal.emit(True, "在指定文件夹中没有找到支持的视频文件。")
             return
+        self.file_progress_signal.emit(0, total_files_to_process)
 
         for filename in os.listdir(self.video_folder):
             if not self.is_running:
@@ -95,6 +102,7 @@ class FFmpegThread(QThread):
                 video_op_success = False
 
                 # 1. 提取音频
+                self.stage_signal.emit("extract_audio")
                 audio_filename = base_name + ".mp3"
                 audio_file_path = os.path.join(self.audio_folder, audio_filename)
                 command_audio = ['ffmpeg', '-i', video_file_path, '-vn', '-acodec', 'libmp3lame', '-y', audio_file_path]
@@ -107,6 +115,7 @@ class FFmpegThread(QThread):
                 if not self.is_running: break
 
                 # 2. 创建无声视频副本
+                self.stage_signal.emit("silent_video")
                 silent_video_file_full_path = os.path.join(self.silent_video_folder, filename)
                 command_silent_video = ['ffmpeg', '-i', video_file_path, '-an', '-vcodec', 'copy', '-y', silent_video_file_full_path]
                 
@@ -126,6 +135,7 @@ class FFmpegThread(QThread):
                 if audio_op_success or video_op_success: # Count as success if at least one op is successful
                     successfully_processed_files +=1
                 self.file_processed_signal.emit(filename)
+                self.file_progress_signal.emit(processed_files_count, total_files_to_process)
 
             elif os.path.isfile(video_file_path):
                 self.progress_signal.emit(f"跳过非视频文件: {filename}")
@@ -140,6 +150,9 @@ class FFmpegThread(QThread):
     def stop(self):
         self.is_running = False
         self.progress_signal.emit("正在尝试中止处理...")
+        process = self.current_process
+        if process is not None and process.poll() is None:
+            process.terminate() # Unblocks communicate() instead of waiting for ffmpeg to finish
 
 class MainWindow(QMainWindow):
     def __init__(self):